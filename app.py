@@ -8,14 +8,37 @@ levels.
 Requirements:
     streamlit >=1.20
     pandas
+    numpy
     yfinance
-    lxml           # for pandas.read_html
+    beautifulsoup4
+    lxml           # parser backend for BeautifulSoup
+    rapidfuzz      # optional, faster fuzzy matching (falls back to difflib)
 """
 
+import json
+import time
+import unicodedata
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+from pathlib import Path
+from types import MappingProxyType
+
+import numpy as np
+import requests
 import yfinance as yf
 import pandas as pd
 import streamlit as st
-from difflib import get_close_matches
+from bs4 import BeautifulSoup, SoupStrainer
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    from rapidfuzz import fuzz, process, utils
+except ImportError:  # rapidfuzz is optional; difflib is the fallback
+    from difflib import get_close_matches
+
+    process = None
 
 # -------------------------------------------------------------
 # Streamlit page configuration
@@ -39,17 +62,100 @@ with st.sidebar:
 # Helper utilities
 # -------------------------------------------------------------
 
-@st.cache_data(show_spinner="Downloading Nifty‑500 list…")
-def load_company_map() -> dict[str, str]:
+# (connect, read) timeout in seconds for direct HTTP calls: an unreachable
+# host fails fast while a slow page still has time to finish downloading
+HTTP_TIMEOUT = (3.05, 10)
+
+
+@st.cache_resource
+def get_session() -> requests.Session:
+    """Return a process‑wide HTTP session so repeat requests reuse connections."""
+    session = requests.Session()
+    # Retry only on error statuses: timeouts must still fail fast, and a
+    # server‑supplied Retry‑After could stall the module‑level scrape
+    retries = Retry(
+        total=2,
+        connect=0,
+        read=0,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        respect_retry_after_header=False,
+    )
+    session.mount(
+        "https://", HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retries)
+    )
+    return session
+
+
+# On‑disk copy of the scraped list so restarts/redeploys skip the scrape
+COMPANY_CACHE_PATH = Path.home() / ".cache" / "candles_capital" / "nifty500.json"
+COMPANY_CACHE_TTL = 24 * 60 * 60  # seconds
+
+
+def _load_cached() -> dict[str, str] | None:
+    """Return the on‑disk company map if it is younger than the TTL and well formed."""
+    try:
+        if time.time() - COMPANY_CACHE_PATH.stat().st_mtime > COMPANY_CACHE_TTL:
+            return None
+        cached = json.loads(COMPANY_CACHE_PATH.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    return cached if isinstance(cached, dict) else None
+
+
+def _save_cached(company_map: dict[str, str]) -> None:
+    """Persist *company_map* to disk; failures only cost a re‑scrape later."""
+    try:
+        COMPANY_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        COMPANY_CACHE_PATH.write_text(json.dumps(company_map), encoding="utf-8")
+    except OSError:
+        pass
+
+
+def _parse_company_table(html: str) -> dict[str, str]:
+    """Extract {SYMBOL: FULL_NAME} from the first table with those headers.
+
+    Only ``<table>`` subtrees are parsed, and rows are read straight into the
+    dict rather than building a DataFrame for every table on the page.
+    """
+    soup = BeautifulSoup(html, "lxml", parse_only=SoupStrainer("table"))
+    for table in soup.find_all("table"):
+        rows = table.find_all("tr")
+        if not rows:
+            continue
+        header = [
+            cell.get_text(strip=True).title() for cell in rows[0].find_all(["th", "td"])
+        ]
+        if "Symbol" in header and "Company Name" in header:
+            break
+    else:
+        raise ValueError("No table with 'Symbol' and 'Company Name' columns found.")
+
+    symbol_col = header.index("Symbol")
+    name_col = header.index("Company Name")
+    company_map = {
+        cells[symbol_col].get_text(strip=True).upper(): cells[name_col].get_text(strip=True).upper()
+        for row in rows[1:]
+        if len(cells := row.find_all("td")) > max(symbol_col, name_col)
+    }
+    if not company_map:
+        raise ValueError("Nifty‑500 table has no rows.")
+    return company_map
+
+
+def _fetch_company_map() -> dict[str, str]:
     """Scrape latest Nifty‑500 constituents and return {SYMBOL: FULL_NAME}."""
+    cached = _load_cached()
+    if cached:
+        return cached
+
     url = "https://www.moneyseth.com/blogs/Nifty-500-Stocks-List"
     try:
-        tables = pd.read_html(url, flavor="bs4")
-        nifty500 = next(t for t in tables if "Symbol" in t.columns)
-        nifty500.columns = nifty500.columns.str.strip().str.title()
-        nifty500["Symbol"] = nifty500["Symbol"].str.upper()
-        nifty500["Company Name"] = nifty500["Company Name"].str.upper()
-        return dict(zip(nifty500["Symbol"], nifty500["Company Name"]))
+        response = get_session().get(url, timeout=HTTP_TIMEOUT)
+        response.raise_for_status()
+        company_map = _parse_company_table(response.text)
+        _save_cached(company_map)
+        return company_map
     except Exception as err:
         st.warning(
             "⚠️ Could not fetch the live Nifty‑500 list. "
@@ -64,21 +170,101 @@ def load_company_map() -> dict[str, str]:
             "SBIN": "STATE BANK OF INDIA",
         }
 
+
+def _trigrams(text: str) -> set[str]:
+    """Return the set of 3‑character substrings of *text*."""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _normalize_key(text: str) -> str:
+    """Return *text* lowercased with accents, punctuation and spaces removed."""
+    return "".join(ch for ch in unicodedata.normalize("NFKD", text).lower() if ch.isalnum())
+
+
+@st.cache_data(show_spinner="Downloading Nifty‑500 list…")
+def load_company_map() -> tuple[
+    dict[str, str],
+    dict[str, str],
+    tuple[str, ...],
+    dict[str, set[int]],
+    dict[str, str],
+]:
+    """Return (company_map, name_to_symbol, names_lower, gram_index, normalized_index).
+
+    ``name_to_symbol`` maps each lowercased company name to its symbol and
+    ``names_lower`` keeps the lowercased names in scrape order, so lookups
+    never have to re‑lowercase the map on a rerun. ``gram_index`` maps every
+    trigram to the positions in ``names_lower`` of the names containing it.
+    ``normalized_index`` maps the :func:`_normalize_key` form of every symbol
+    and name to the symbol, symbols taking precedence.
+    """
+    company_map = _fetch_company_map()
+    name_to_symbol: dict[str, str] = {}
+    for symbol, name in company_map.items():
+        name_to_symbol.setdefault(name.lower(), symbol)
+    names_lower = tuple(name.lower() for name in company_map.values())
+    gram_index: dict[str, set[int]] = {}
+    for pos, name in enumerate(names_lower):
+        for gram in _trigrams(name):
+            gram_index.setdefault(gram, set()).add(pos)
+    normalized_index: dict[str, str] = {}
+    for symbol in company_map:
+        normalized_index.setdefault(_normalize_key(symbol), symbol)
+    for symbol, name in company_map.items():
+        normalized_index.setdefault(_normalize_key(name), symbol)
+    return company_map, name_to_symbol, names_lower, gram_index, normalized_index
+
 # Load map once per session
-company_map = load_company_map()
-
-# Sector‑specific ratios
-SECTOR_RATIOS = {
-    "Banks": ["priceToBook", "returnOnEquity"],
-    "NBFCs": ["priceToBook", "trailingPE"],
-    "Information Technology": ["trailingPE", "enterpriseToEbitda"],
-    "IT Services": ["trailingPE", "enterpriseToEbitda"],
-    "FMCG": ["trailingPE", "enterpriseToEbitda"],
-    "Pharmaceuticals": ["trailingPE", "enterpriseToEbitda"],
-    "Steel": ["enterpriseToEbitda"],
-    "Cement": ["enterpriseToEbitda"],
-    "Retail": ["trailingPE", "enterpriseToRevenue"],
-}
+company_map, name_to_symbol, names_lower, gram_index, normalized_index = load_company_map()
+
+# Sector‑specific ratios (read‑only)
+SECTOR_RATIOS = MappingProxyType({
+    "Banks": ("priceToBook", "returnOnEquity"),
+    "NBFCs": ("priceToBook", "trailingPE"),
+    "Information Technology": ("trailingPE", "enterpriseToEbitda"),
+    "IT Services": ("trailingPE", "enterpriseToEbitda"),
+    "FMCG": ("trailingPE", "enterpriseToEbitda"),
+    "Pharmaceuticals": ("trailingPE", "enterpriseToEbitda"),
+    "Steel": ("enterpriseToEbitda",),
+    "Cement": ("enterpriseToEbitda",),
+    "Retail": ("trailingPE", "enterpriseToRevenue"),
+})
+
+# (ratios, minimum positive ratios to count as strong) per sector, so scoring
+# needs a single lookup (read‑only)
+SECTOR_SPEC = MappingProxyType({
+    sector: (ratios, max(1, len(ratios) // 2)) for sector, ratios in SECTOR_RATIOS.items()
+})
+
+# Map interval → reasonable lookback period, and the interval to retry with
+# when Yahoo returns no data for the requested one
+INTERVAL_PERIOD_MAP = {"1d": "1mo", "1wk": "1y", "1mo": "2y"}
+FALLBACK_INTERVALS = {"1d": "5d", "1wk": "1mo", "1mo": "3mo"}
+
+# Entry / target / stop as multiples of the last close
+LEVEL_MULTIPLIERS = np.array([0.98, 1.08, 0.94])
+
+# Valuation position labels, indexed low (0) / mid (1) / high (2)
+VALUATION_COMMENTS = (
+    "📉 Trading near lower end (possibly undervalued).",
+    "🔄 Mid‑range valuation.",
+    "📍 Trading near 6‑month highs (possibly overvalued).",
+)
+
+
+def _fuzzy_match(query: str, candidates) -> str | None:
+    """Return the candidate closest to *query*, or None below the cutoff."""
+    if process is not None:
+        match = process.extractOne(
+            query,
+            candidates,
+            scorer=fuzz.WRatio,
+            processor=utils.default_process,
+            score_cutoff=60,
+        )
+        return match[0] if match else None
+    closest = get_close_matches(query, candidates, n=1, cutoff=0.6)
+    return closest[0] if closest else None
 
 
 def get_symbol_from_name(company_input: str) -> str | None:
@@ -86,130 +272,276 @@ def get_symbol_from_name(company_input: str) -> str | None:
     if not company_input:
         return None
 
-    input_clean = company_input.strip().upper()
-    input_lower = company_input.strip().lower()
+    query = company_input.strip()
+    input_clean = query.upper()
+    input_lower = query.lower()
 
     # 1️⃣ Exact symbol match
     if input_clean in company_map:
         return input_clean
 
     # 2️⃣ Exact full‑name match
-    for symbol, name in company_map.items():
-        if name.lower() == input_lower:
-            return symbol
-
-    # 3️⃣ Sub‑string match
-    for symbol, name in company_map.items():
-        if input_lower in name.lower():
-            return symbol
-
-    # 4️⃣ Fuzzy match
-    closest = get_close_matches(
-        input_lower,
-        [n.lower() for n in company_map.values()],
-        n=1,
-        cutoff=0.6,
+    symbol = name_to_symbol.get(input_lower)
+    if symbol:
+        return symbol
+
+    # 2️⃣b Exact match ignoring case, accents, punctuation and spacing
+    symbol = normalized_index.get(_normalize_key(query))
+    if symbol:
+        return symbol
+
+    # 3️⃣ Sub‑string match (only names sharing every query trigram can match)
+    grams = _trigrams(input_lower)
+    postings = [gram_index.get(gram, set()) for gram in grams]
+    if postings:
+        positions = sorted(min(postings, key=len).intersection(*postings))
+    else:
+        positions = range(len(names_lower))
+    match = next(
+        (names_lower[pos] for pos in positions if input_lower in names_lower[pos]),
+        None,
     )
-    if closest:
-        for symbol, name in company_map.items():
-            if name.lower() == closest[0]:
-                return symbol
+    if match:
+        return name_to_symbol[match]
+
+    # 4️⃣ Fuzzy match over the names sharing at least two query trigrams, and
+    # over every name only when that shortlist has no match. Trade‑off: a
+    # closer name outside the shortlist loses to any shortlisted match above
+    # the cutoff, in exchange for not scoring the full list on most lookups.
+    hits = Counter(chain.from_iterable(postings))
+    needed = min(2, len(postings))
+    shortlist = [names_lower[pos] for pos in sorted(hits) if hits[pos] >= needed]
+    match = _fuzzy_match(input_lower, shortlist)
+    if match is None and len(shortlist) < len(names_lower):
+        match = _fuzzy_match(input_lower, names_lower)
+    if match:
+        return name_to_symbol[match]
 
     return None
 
 
-def check_fundamentals(symbol: str) -> tuple[bool, str | None]:
-    """Return (is_fundamentally_strong, sector)."""
-    try:
-        info = yf.Ticker(symbol).info
-        sector = info.get("sector")
-        ratios = SECTOR_RATIOS.get(sector, [])
-        score = sum(
-            1 for ratio in ratios if isinstance(info.get(ratio), (int, float)) and info[ratio] > 0
-        )
-        return score >= max(1, len(ratios) // 2), sector
-    except Exception:
-        return False, None
+@st.cache_resource(ttl=900, max_entries=128)
+def get_ticker(symbol: str) -> yf.Ticker:
+    """Return a shared ``yf.Ticker`` for *symbol*.
+
+    The TTL bounds how long yfinance's own per‑object caches (e.g. ``info``)
+    can outlive the data caches below.
+    """
+    return yf.Ticker(symbol)
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def get_info(symbol: str) -> dict:
+    """Fetch ``Ticker.info`` for *symbol*, memoized across reruns."""
+    return get_ticker(symbol).info
+
+
+@st.cache_data(ttl=900, show_spinner=False)
+def get_history(symbol: str, period: str, interval: str) -> pd.DataFrame:
+    """Fetch OHLC history for *symbol*, memoized across reruns."""
+    return get_ticker(symbol).history(period=period, interval=interval)
+
+
+@st.cache_data(ttl=900, show_spinner=False)
+def fetch_many(symbols: tuple[str, ...], period: str, interval: str) -> pd.DataFrame:
+    """Fetch OHLC history for several symbols in one batched, threaded download.
+
+    The result has ``(symbol, field)`` column pairs, one group per ticker.
+    """
+    return yf.download(
+        list(symbols),
+        period=period,
+        interval=interval,
+        threads=True,
+        group_by="ticker",
+        progress=False,
+        auto_adjust=True,
+    )
+
+
+def _has_prices(df: pd.DataFrame) -> bool:
+    """Return True if *df* holds at least one usable close."""
+    if df.empty:
+        return False
+    # One vectorized scan of the raw array instead of an isna() boolean Series
+    return not np.isnan(df.Close.to_numpy(dtype=np.float64, copy=False)).all()
+
+
+def fetch_with_fallback(symbol: str, timeframe: str) -> tuple[pd.DataFrame, str]:
+    """Return (history, interval_used), retrying a fallback interval on empty data.
+
+    Both attempts go through the memoized :func:`get_history`, so the retry
+    is a cache hit on subsequent reruns.
+    """
+    period = INTERVAL_PERIOD_MAP.get(timeframe, "6mo")
+    df = get_history(symbol, period, timeframe)
+    fallback = FALLBACK_INTERVALS.get(timeframe)
+    if _has_prices(df) or not fallback:
+        return df, timeframe
+    return get_history(symbol, period, fallback), fallback
+
+
+def check_fundamentals(info: dict) -> tuple[bool, str | None]:
+    """Return (is_fundamentally_strong, sector) for an already‑fetched ``info``."""
+    sector = info.get("sector")
+    ratios, needed = SECTOR_SPEC.get(sector, ((), 1))
+    score = 0
+    for ratio in ratios:
+        value = info.get(ratio)
+        if isinstance(value, (int, float)) and value > 0:
+            score += 1
+            if score >= needed:
+                return True, sector
+    return False, sector
+
+
+def suggest_levels(df: pd.DataFrame) -> dict[str, float | str]:
+    """Return entry/target/stop levels and a valuation comment for *df*."""
+    # One float64 block for the three columns: the reductions below skip
+    # pandas' indexing layer
+    high_np, low_np, close_np = df[["High", "Low", "Close"]].to_numpy(dtype=np.float64).T
+
+    # Yahoo can append a still‑forming bar with a NaN close; use the last real one
+    last_close = close_np[~np.isnan(close_np)][-1]
+    high_6m = np.nanmax(high_np)
+    low_6m = np.nanmin(low_np)
+
+    entry, target, stop = np.round(last_close * LEVEL_MULTIPLIERS, 2).tolist()
+
+    # Near‑high takes precedence over near‑low when the range is very narrow
+    near_high = last_close >= high_6m * 0.95
+    near_low = last_close <= low_6m * 1.05
+    valuation_comment = VALUATION_COMMENTS[2 if near_high else 0 if near_low else 1]
+    return {
+        "Entry Range (₹)": entry,
+        "Target Range (₹)": target,
+        "Stop Loss (₹)": stop,
+        "Valuation Position": valuation_comment,
+    }
+
+
+@st.cache_data(ttl=600, show_spinner=False)
+def analyze(symbol: str, timeframe: str) -> dict:
+    """Run the single‑stock pipeline and return only what the UI renders.
+
+    Memoizing the small result means an unchanged (symbol, timeframe) rerun
+    skips even unpickling the cached history frame and re‑deriving levels.
+    ``levels`` is None when no usable prices exist, even after the fallback.
+    """
+    # info and history are independent Yahoo round‑trips: overlap them
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        info_future = pool.submit(get_info, symbol)
+        history_future = pool.submit(fetch_with_fallback, symbol, timeframe)
+        info = info_future.result()
+        df, used_timeframe = history_future.result()
+    is_strong, sector = check_fundamentals(info)
+    return {
+        "name": info.get("shortName", symbol),
+        "sector": sector,
+        "is_strong": is_strong,
+        "timeframe": used_timeframe,
+        "levels": suggest_levels(df) if _has_prices(df) else None,
+    }
+
+
+def show_levels(levels: dict[str, list]) -> None:
+    """Render the suggested‑levels table from column lists, one row per stock."""
+    st.markdown("### 📌 Suggested Levels")
+    levels_df = pd.DataFrame(levels)
+    price_column = st.column_config.NumberColumn(format="%.2f")
+    st.dataframe(
+        levels_df,
+        column_config={
+            "Entry Range (₹)": price_column,
+            "Target Range (₹)": price_column,
+            "Stop Loss (₹)": price_column,
+        },
+        hide_index=True,
+        use_container_width=True,
+    )
 
 
 # -------------------------------------------------------------
 # UI: Main panel
 # -------------------------------------------------------------
 st.markdown("## 🧠 Enter Analysis Criteria")
-company_input = st.text_input("Enter Company Name or Symbol (e.g., Infosys, TCS)")
+company_input = st.text_input(
+    "Enter Company Name or Symbol (e.g., Infosys, TCS) — separate several with commas"
+)
 timeframe = st.selectbox("Select Timeframe", ["1d", "1wk", "1mo"])
 
-if company_input:
+if st.button("🔄 Refresh data"):
+    for cached in (analyze, get_info, get_history, fetch_many, get_ticker):
+        cached.clear()
+
+if company_input and "," in company_input:
+    queries = [part.strip() for part in company_input.split(",") if part.strip()]
+    resolved = {query: get_symbol_from_name(query) for query in queries}
+    unresolved = [query for query, symbol in resolved.items() if not symbol]
+    symbols = tuple(dict.fromkeys(symbol for symbol in resolved.values() if symbol))
+    if unresolved:
+        st.warning(f"⚠️ Could not resolve: {', '.join(unresolved)}")
+    if not symbols:
+        st.error("❌ Could not resolve any of the company names. Please check spelling.")
+        st.stop()
+
+    try:
+        period = INTERVAL_PERIOD_MAP.get(timeframe, "6mo")
+        prices = fetch_many(symbols, period, timeframe)
+        downloaded = set(prices.columns.get_level_values(0))
+
+        # Built column‑wise so the frame is assembled from lists, not records
+        levels = {"Stock Name": []}
+        missing = []
+        for symbol in symbols:
+            df = prices[symbol].dropna(how="all") if symbol in downloaded else None
+            if df is None or not _has_prices(df):
+                missing.append(symbol)
+                continue
+            levels["Stock Name"].append(symbol)
+            for column, value in suggest_levels(df).items():
+                levels.setdefault(column, []).append(value)
+
+        if missing:
+            st.warning(f"⚠️ No '{timeframe}' data for: {', '.join(missing)}")
+        if not levels["Stock Name"]:
+            st.error("❌ No data available for the selected stocks/timeframe.")
+            st.stop()
+        show_levels(levels)
+
+    except Exception as err:
+        st.error("An unexpected error occurred while processing your request.")
+        st.exception(err)
+
+elif company_input:
     symbol = get_symbol_from_name(company_input)
     if not symbol:
         st.error("❌ Could not resolve the company name. Please check spelling or try another.")
         st.stop()
 
     try:
-        ticker = yf.Ticker(symbol)
-        info = ticker.info
-
-        # Map interval → reasonable lookback period
-        interval_period_map = {"1d": "1mo", "1wk": "1y", "1mo": "2y"}
-        selected_period = interval_period_map.get(timeframe, "6mo")
-        df = ticker.history(period=selected_period, interval=timeframe)
-
-        # Fallback if empty
-        fallback_intervals = {"1d": "5d", "1wk": "1mo", "1mo": "3mo"}
-        if df.empty or df.Close.isna().all():
-            fallback = fallback_intervals.get(timeframe)
-            if fallback:
-                st.warning(f"No data for '{timeframe}'. Trying fallback '{fallback}'…")
-                df = ticker.history(period=selected_period, interval=fallback)
-                timeframe = fallback
-
-        if df.empty or df.Close.isna().all():
+        result = analyze(symbol, timeframe)
+
+        if result["timeframe"] != timeframe:
+            st.warning(f"No data for '{timeframe}'. Using fallback '{result['timeframe']}'…")
+            timeframe = result["timeframe"]
+
+        if result["levels"] is None:
             st.error("❌ No data available even after fallback. Please try another stock/timeframe.")
             st.stop()
 
-        is_strong, sector = check_fundamentals(symbol)
-
-        st.subheader(f"📄 {info.get('shortName', symbol)} ({symbol})")
-        st.markdown(f"**Sector:** {sector or 'Unknown'}")
+        st.subheader(f"📄 {result['name']} ({symbol})")
+        st.markdown(f"**Sector:** {result['sector'] or 'Unknown'}")
 
-        if is_strong:
+        if result["is_strong"]:
             st.success("✅ Fundamentally strong based on sector‑specific ratios.")
         else:
             st.error("❌ Fundamentally weak based on sector criteria.")
 
-        last_close = df.Close.iloc[-1]
-        high_6m = df.High.max()
-        low_6m = df.Low.min()
-
-        entry = round(last_close * 0.98, 2)
-        target = round(last_close * 1.08, 2)
-        stop = round(last_close * 0.94, 2)
-
-        valuation_comment = (
-            "📍 Trading near 6‑month highs (possibly overvalued)."
-            if last_close >= high_6m * 0.95 else
-            "📉 Trading near lower end (possibly undervalued)."
-            if last_close <= low_6m * 1.05 else
-            "🔄 Mid‑range valuation."
-        )
-
-        st.markdown("### 📌 Suggested Levels")
-        levels_df = pd.DataFrame([
-            {
-                "Stock Name": info.get("shortName", symbol),
-                "Entry Range (₹)": float(entry),
-                "Target Range (₹)": float(target),
-                "Stop Loss (₹)": float(stop),
-                "Valuation Position": valuation_comment,
-            }
-        ])
-        st.dataframe(
-            levels_df.style.set_table_styles([
-                {"selector": "thead th", "props": [("font-size", "14px")]},
-                {"selector": "td", "props": [("font-size", "13px")]},
-            ]),
-            use_container_width=True,
-        )
+        show_levels({
+            "Stock Name": [result["name"]],
+            **{column: [value] for column, value in result["levels"].items()},
+        })
 
     except Exception as err:
         st.error("An unexpected error occurred while processing your request.")